@@ -6,16 +6,87 @@ Creates proper directory structure and metadata
 
 import os
 import shutil
+import stat
 import hashlib
 import json
+import mmap
+import struct
+import sys
+import threading
 from pathlib import Path
+from collections import Counter, deque
 from datetime import datetime
+from queue import Queue
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import blake3
+except ImportError:  # Optional: pip install blake3
+    blake3 = None
+
+# Digests detect duplicates and name the samples that had to be hashed;
+# blake3 is faster but needs the optional blake3 package
+HASH_ALGORITHMS = ['sha256', 'blake3']
+
+# Samples per worker task, and how many tasks may be queued before the
+# scan waits for results
+BATCH_SIZE = 16
+MAX_IN_FLIGHT = 4 * (os.cpu_count() or 1)
+
+# Files at least this large are hashed through mmap
+MMAP_THRESHOLD = 64 * 1024
+
+# Reused by every buffered hash; hashing is single-threaded per worker process
+_READ_BUFFER = bytearray(1 << 20)
+
+# ioctl from linux/fs.h: make dst a copy-on-write clone of src
+FICLONE = 0x40049409
+
+class ProgressWriter:
+    """Batch per-sample progress lines into few stdout writes"""
+    
+    def __init__(self, batch_size=100):
+        self.batch_size = batch_size
+        self.lines = []
+        self.lock = threading.Lock()
+    
+    def write(self, line):
+        """Buffer a progress line, flushing every batch_size lines"""
+        with self.lock:
+            self.lines.append(line)
+            if len(self.lines) >= self.batch_size:
+                self._flush()
+    
+    def error(self, line):
+        """Write an error line to stderr right away"""
+        with self.lock:
+            self._flush()
+            print(line, file=sys.stderr, flush=True)
+    
+    def flush(self):
+        """Write out any buffered lines"""
+        with self.lock:
+            self._flush()
+    
+    def _flush(self):
+        if self.lines:
+            sys.stdout.write('\n'.join(self.lines) + '\n')
+            sys.stdout.flush()
+            self.lines.clear()
 
 class SampleOrganizer:
     """Organize malware and benign samples"""
     
-    def __init__(self, base_dir="packhero-dataset"):
+    def __init__(self, base_dir="packhero-dataset", link_mode='reflink',
+                 hash_algorithm='sha256'):
         self.base_dir = Path(base_dir)
+        self.link_mode = link_mode
+        self.hash_algorithm = hash_algorithm
         self.stats = {
             'malware': 0,
             'benign': 0,
@@ -23,6 +94,22 @@ class SampleOrganizer:
             'errors': 0
         }
         
+        # Names of the .exe files in original/<sample_type>, kept up to date
+        # as samples are copied so metadata doesn't have to rescan
+        self.dataset_files = {'malware': set(), 'benign': set()}
+        
+        # (path, stat) of the samples found by setup_directories, so the
+        # size prefilter can compare against them without another scan
+        self.dataset_samples = {'malware': [], 'benign': []}
+        
+        # (dev, ino, size, mtime_ns) -> digest, persisted across runs
+        self.hash_cache_file = self.base_dir / 'metadata' / '.hash_cache.json'
+        self.hash_cache = self.load_hash_cache()
+        
+        # Keys looked up or stored by this run; only these are saved, so
+        # entries for deleted or changed files don't pile up
+        self.hash_cache_used = set()
+        
     def setup_directories(self):
         """Create directory structure"""
         print("Creating directory structure...")
@@ -43,23 +130,112 @@ class SampleOrganizer:
         for dir_path in dirs:
             (self.base_dir / dir_path).mkdir(parents=True, exist_ok=True)
         
+        # Remember samples left by previous runs
+        for sample_type, names in self.dataset_files.items():
+            orig_path = self.base_dir / 'original' / sample_type
+            for entry in _iter_exe_files(orig_path):
+                try:
+                    st = os.stat(entry.path, follow_symlinks=False)
+                except OSError:
+                    continue
+                names.add(entry.name)
+                self.dataset_samples[sample_type].append((entry.path, st))
+        
         print("✓ Directory structure created")
     
-    def get_file_hash(self, filepath):
-        """Calculate SHA256 hash"""
-        sha256 = hashlib.sha256()
+    def load_hash_cache(self):
+        """Load hashes computed by previous runs"""
+        try:
+            with open(self.hash_cache_file) as f:
+                raw = json.load(f)
+            
+            # Digests from a different algorithm can't be compared
+            if raw.get('algorithm') != self.hash_algorithm:
+                return {}
+            
+            return {
+                tuple(map(int, key.split(':'))): bytes.fromhex(value)
+                for key, value in raw['hashes'].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # Missing or malformed cache: start from scratch
+            return {}
+    
+    def save_hash_cache(self):
+        """Atomically persist the hash cache for the next run"""
+        raw = {
+            'algorithm': self.hash_algorithm,
+            'hashes': {
+                ':'.join(map(str, key)): value.hex()
+                for key, value in self.hash_cache.items()
+                if key in self.hash_cache_used
+            }
+        }
+        _write_json_atomic(self.hash_cache_file, raw, separators=(',', ':'))
+    
+    @staticmethod
+    def get_file_hash(filepath, st=None, algorithm='sha256'):
+        """
+        Calculate the file digest (raw bytes)
+        
+        Args:
+            filepath: File to hash
+            st: os.stat_result from the scan, saves an fstat when given
+            algorithm: One of HASH_ALGORITHMS
+        """
         with open(filepath, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                sha256.update(chunk)
-        return sha256.hexdigest()
+            size = st.st_size if st is not None else os.fstat(f.fileno()).st_size
+            
+            # Small files: one read is cheaper than setting up a mapping
+            if size < MMAP_THRESHOLD:
+                hasher = _new_hasher(algorithm)
+                hasher.update(f.read())
+                return hasher.digest()
+            
+            # Large files: ask for aggressive readahead. The pages are kept
+            # for the copy step and dropped afterwards (_drop_page_cache)
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            return SampleOrganizer._hash_large_file(f, algorithm)
     
-    def is_pe_file(self, filepath):
+    @staticmethod
+    def _hash_large_file(f, algorithm):
+        """Hash an open file, via mmap when the filesystem allows it"""
+        # Hash straight from the page cache without copying into user space
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                hasher = _new_hasher(algorithm)
+                hasher.update(mm)
+                return hasher.digest()
+        except (OSError, ValueError):
+            # Some filesystems (FUSE, network mounts) can't be mapped
+            pass
+        
+        # Read into the shared buffer: no bytes object per chunk, and
+        # most samples fit in one or two reads
+        hasher = _new_hasher(algorithm)
+        mv = memoryview(_READ_BUFFER)
+        while n := f.readinto(mv):
+            hasher.update(mv[:n])
+        return hasher.digest()
+    
+    @staticmethod
+    def is_pe_file(filepath):
         """Check if file is a valid PE executable"""
         try:
-            with open(filepath, 'rb') as f:
-                header = f.read(2)
-                return header == b'MZ'  # DOS/PE header
-        except:
+            if not hasattr(os, 'pread'):  # Windows
+                with open(filepath, 'rb') as f:
+                    return f.read(2) == b'MZ'  # DOS/PE header
+            
+            # Raw fd + pread: no buffered file object for a 2 byte read
+            fd = os.open(filepath, os.O_RDONLY)
+            try:
+                return os.pread(fd, 2, 0) == b'MZ'
+            finally:
+                os.close(fd)
+        except OSError:
             return False
     
     def organize_samples(self, source_dir, sample_type='malware'):
@@ -70,77 +246,238 @@ class SampleOrganizer:
             source_dir: Directory containing .exe files
             sample_type: 'malware' or 'benign'
         """
-        source_path = Path(source_dir)
-        dest_path = self.base_dir / 'original' / sample_type
+        self.organize([(source_dir, sample_type)])
+    
+    def organize(self, sources):
+        """
+        Organize samples from several source directories at once
         
-        if not source_path.exists():
-            print(f"✗ Source directory not found: {source_path}")
-            return
+        All sources share one worker pool, so the pool never idles at the
+        end of one directory while the next one is still waiting. Files are
+        handed to the pool while the directories are still being scanned.
         
-        print(f"\nOrganizing {sample_type} samples from: {source_path}")
+        Args:
+            sources: List of (source_dir, sample_type) pairs
+        """
+        progress = ProgressWriter()
         
-        # Track hashes to detect duplicates
-        seen_hashes = set()
+        # Results from all sources interleave, so announce every source up
+        # front and tag each progress line with its sample type
+        print()
+        source_paths = []
+        for source_dir, sample_type in sources:
+            source_path = Path(source_dir)
+            if not source_path.exists():
+                print(f"✗ Source directory not found: {source_path}")
+                continue
+            print(f"Organizing {sample_type} samples from: {source_path}")
+            source_paths.append((source_path, sample_type))
         
-        # Get all .exe files
-        exe_files = list(source_path.glob('*.exe'))
+        # Track digests to detect duplicates; raw bytes are less than half
+        # the size of hex strings and cheaper to hash
+        seen_hashes = {sample_type: set() for _, sample_type in sources}
+        dataset_hashes = {sample_type: set() for _, sample_type in sources}
         
-        if not exe_files:
-            print(f"  No .exe files found in {source_path}")
-            return
+        # A file whose size is unique (within its sample type) can't be a
+        # duplicate, so it is validated and copied without hashing. Maps
+        # (sample_type, size) to (path, st, in_dataset) entries seen with
+        # that size that have not been hashed yet; they are hashed once
+        # another file collides.
+        unhashed_of_size = {}
         
-        for idx, file_path in enumerate(exe_files, 1):
-            try:
-                # Validate PE file
-                if not self.is_pe_file(file_path):
-                    print(f"  [{idx}/{len(exe_files)}] ✗ Not a valid PE file: {file_path.name}")
-                    self.stats['errors'] += 1
-                    continue
-                
-                # Calculate hash
-                file_hash = self.get_file_hash(file_path)
-                
-                # Check for duplicates
-                if file_hash in seen_hashes:
-                    print(f"  [{idx}/{len(exe_files)}] ⊙ Duplicate: {file_path.name}")
-                    self.stats['duplicates'] += 1
-                    continue
-                
-                seen_hashes.add(file_hash)
-                
-                # Create new filename with hash prefix
-                new_name = f"{sample_type}_{file_hash[:16]}_{file_path.name}"
-                dest_file = dest_path / new_name
+        # Samples from earlier runs (found by setup_directories) take part
+        # too: a source file the same size as one already in the dataset
+        # gets hashed against it, so a rerun (or a touched source file)
+        # can't copy it in a second time
+        for sample_type in {sample_type for _, sample_type in source_paths}:
+            for path, st in self.dataset_samples[sample_type]:
+                unhashed_of_size.setdefault((sample_type, st.st_size), []).append(
+                    (path, st, True)
+                )
+        
+        batch = []
+        in_flight = deque()
+        processed = 0
+        
+        # Copies run on their own thread so the next results can be
+        # deduplicated while the previous sample is still being written
+        copy_q = Queue(maxsize=16)
+        copy_stats = Counter()
+        copier = threading.Thread(
+            target=self._copy_worker,
+            args=(copy_q, copy_stats, progress),
+            daemon=True
+        )
+        copier.start()
+        
+        def handle_result(task, result):
+            nonlocal processed
+            path, name, st, sample_type, hashed, _, seed = task
+            _, file_hash, ok, err = result
+            
+            if file_hash is not None:
+                self.hash_cache[_cache_key(st)] = file_hash
+            elif hashed:
+                # Cached, or hashed by an earlier task for the same file
+                # (results are handled in submission order)
+                file_hash = self.hash_cache.get(_cache_key(st))
+            
+            # Seeds are files handled earlier that only needed hashing after
+            # a size collision; they just feed duplicate detection
+            if seed:
+                if ok and file_hash is not None:
+                    seen_hashes[sample_type].add(file_hash)
+                    if seed == 'dataset':
+                        dataset_hashes[sample_type].add(file_hash)
+                        # Source seeds may still be waiting for the copy
+                        # thread, which drops their pages itself
+                        _drop_page_cache(path, st)
+                return
+            
+            processed += 1
+            
+            if not ok:
+                if err is None:
+                    progress.error(f"  [{processed}] ✗ Not a valid PE file: {sample_type}/{name}")
+                else:
+                    progress.error(f"  [{processed}] ✗ Error processing {sample_type}/{name}: {err}")
+                self.stats['errors'] += 1
+                return
+            
+            # Check for duplicates (only size collisions were hashed)
+            if file_hash is None:
+                # Unique size so far: name it by size and mtime instead
+                file_hash = _stat_id(st)
+            elif file_hash in seen_hashes[sample_type]:
+                if file_hash in dataset_hashes[sample_type]:
+                    progress.write(f"  [{processed}] ⊙ Already in dataset: {sample_type}/{name}")
+                else:
+                    progress.write(f"  [{processed}] ⊙ Duplicate: {sample_type}/{name}")
+                self.stats['duplicates'] += 1
+                _drop_page_cache(path, st)
+                return
+            
+            seen_hashes[sample_type].add(file_hash)
+            
+            # Prefix: digest for hashed samples, size/mtime id otherwise
+            new_name = f"{sample_type}_{file_hash.hex()[:16]}_{name}"
+            dest_file = self.base_dir / 'original' / sample_type / new_name
+            
+            copy_q.put((f"[{processed}]", path, name, st, dest_file, sample_type))
+        
+        def collect(block):
+            # Results are handled in submission order so duplicate detection
+            # stays deterministic; only wait when too much work is queued
+            while in_flight and (block or in_flight[0][0].done()
+                                 or len(in_flight) > MAX_IN_FLIGHT):
+                future, tasks = in_flight.popleft()
+                for task, result in zip(tasks, future.result()):
+                    handle_result(task, result)
+        
+        def dispatch():
+            if batch:
+                jobs = [
+                    (path, st, need_hash, self.hash_algorithm)
+                    for path, _, st, _, _, need_hash, _ in batch
+                ]
+                in_flight.append((executor.submit(_process_batch, jobs), batch.copy()))
+                batch.clear()
+            collect(block=False)
+        
+        # Cache keys already sent to be hashed; a hardlinked dataset file
+        # and its source share a key and only need hashing once
+        pending_keys = set()
+        
+        def submit(path, name, st, sample_type, hashed, seed=None):
+            need_hash = False
+            if hashed:
+                # Skip files already hashed by a previous run or this one
+                key = _cache_key(st)
+                self.hash_cache_used.add(key)
+                need_hash = key not in self.hash_cache and key not in pending_keys
+                if need_hash:
+                    pending_keys.add(key)
+            batch.append((path, name, st, sample_type, hashed, need_hash, seed))
+            if len(batch) >= BATCH_SIZE:
+                dispatch()
+        
+        try:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                for source_path, sample_type in source_paths:
+                    found = 0
+                    for entry in _iter_exe_files(source_path):
+                        found += 1
+                        try:
+                            # Not entry.stat(): on Windows it leaves st_dev
+                            # and st_ino at 0, which breaks the cache key
+                            st = os.stat(entry.path, follow_symlinks=False)
+                        except OSError as e:
+                            progress.error(f"  ✗ Error processing {sample_type}/{entry.name}: {e}")
+                            self.stats['errors'] += 1
+                            continue
+                        
+                        key = (sample_type, st.st_size)
+                        if key not in unhashed_of_size:
+                            unhashed_of_size[key] = [(entry.path, st, False)]
+                            submit(entry.path, entry.name, st, sample_type, hashed=False)
+                            continue
+                        
+                        # Size collision: hash the earlier files too
+                        for path, seed_st, in_dataset in unhashed_of_size[key]:
+                            submit(path, os.path.basename(path), seed_st, sample_type,
+                                   hashed=True, seed='dataset' if in_dataset else 'source')
+                        unhashed_of_size[key] = []
+                        submit(entry.path, entry.name, st, sample_type, hashed=True)
+                    
+                    if not found:
+                        progress.write(f"  No .exe files found in {source_path}")
                 
+                unhashed_of_size.clear()
+                dispatch()
+                collect(block=True)
+        finally:
+            copy_q.put(None)
+            copier.join()
+            progress.flush()
+        
+        for key, count in copy_stats.items():
+            self.stats[key] += count
+    
+    def _copy_worker(self, copy_q, copy_stats, progress):
+        """Copy queued samples into the dataset until a None sentinel arrives"""
+        while (item := copy_q.get()) is not None:
+            label, path, name, st, dest_file, sample_type = item
+            try:
                 # Copy file
-                shutil.copy2(file_path, dest_file)
-                
-                print(f"  [{idx}/{len(exe_files)}] ✓ {new_name}")
-                self.stats[sample_type] += 1
-                
+                _link_or_copy(path, dest_file, st, self.link_mode)
             except Exception as e:
-                print(f"  [{idx}/{len(exe_files)}] ✗ Error processing {file_path.name}: {e}")
-                self.stats['errors'] += 1
+                progress.error(f"  {label} ✗ Error processing {sample_type}/{name}: {e}")
+                copy_stats['errors'] += 1
+                continue
+            finally:
+                _drop_page_cache(path, st)
+            
+            progress.write(f"  {label} ✓ {dest_file.name}")
+            copy_stats[sample_type] += 1
+            self.dataset_files[sample_type].add(dest_file.name)
     
     def generate_metadata(self):
         """Generate metadata about the dataset"""
         metadata = {
             'created': datetime.now().isoformat(),
             'structure': 'PackHero dataset',
+            'hash_algorithm': self.hash_algorithm,
             'statistics': self.stats.copy()
         }
         
         # Count files in each directory
-        for sample_type in ['malware', 'benign']:
-            orig_path = self.base_dir / 'original' / sample_type
-            if orig_path.exists():
-                count = len(list(orig_path.glob('*.exe')))
-                metadata[f'{sample_type}_count'] = count
+        for sample_type, names in self.dataset_files.items():
+            metadata[f'{sample_type}_count'] = len(names)
         
         # Save metadata
         metadata_file = self.base_dir / 'metadata' / 'dataset_info.json'
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        # Small and read by people, so keep it indented
+        _write_json_atomic(metadata_file, metadata, indent=2)
         
         print(f"\n✓ Metadata saved to: {metadata_file}")
         return metadata
@@ -154,11 +491,13 @@ class SampleOrganizer:
         print(f"Benign samples organized: {self.stats['benign']}")
         print(f"Duplicates skipped: {self.stats['duplicates']}")
         print(f"Errors encountered: {self.stats['errors']}")
-        print(f"Total samples: {self.stats['malware'] + self.stats['benign']}")
+        
+        # Samples kept from earlier runs count towards the dataset too
+        total = len(self.dataset_files['malware']) + len(self.dataset_files['benign'])
+        print(f"Total samples in dataset: {total}")
         print("="*60)
         
         # Check if we have enough samples
-        total = self.stats['malware'] + self.stats['benign']
         if total < 10:
             print("\n⚠️  Warning: You have fewer than 10 samples.")
             print("   PackHero needs at least 10 samples per packer.")
@@ -175,6 +514,199 @@ class SampleOrganizer:
         print("  2. Generate labels: python3 generate_labels.py")
         print("  3. Configure PackHero with your samples")
 
+def _reflink(src, dst):
+    """Make dst a copy-on-write clone of src with the FICLONE ioctl"""
+    if fcntl is None:
+        raise OSError("reflink not supported on this platform")
+    
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def _copy_file_range(src_fd, dst_fd, size):
+    """Copy in the kernel; Linux 5.3+ reflinks on filesystems that can"""
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError("copy_file_range not supported on this platform")
+    
+    remaining = size
+    while remaining > 0:
+        copied = os.copy_file_range(src_fd, dst_fd, remaining)
+        if copied == 0:
+            break
+        remaining -= copied
+    
+    # Some FUSE/virtiofs mounts report 0 instead of failing
+    if remaining > 0:
+        raise OSError(f"copy_file_range stopped {remaining} bytes short")
+
+def _sendfile(src_fd, dst_fd, size):
+    """Copy in the kernel with sendfile (file to file works on Linux)"""
+    if not hasattr(os, 'sendfile'):
+        raise OSError("sendfile not supported on this platform")
+    
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+    
+    if offset < size:
+        raise OSError(f"sendfile stopped {size - offset} bytes short")
+
+def _copy_metadata(dst, st):
+    """Apply the permissions and timestamps from a source stat to dst"""
+    os.chmod(dst, stat.S_IMODE(st.st_mode))
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def _fast_copy(src, dst, st):
+    """
+    Copy src to dst with copy2 semantics, keeping the bytes in the kernel
+    
+    Tries os.copy_file_range, then os.sendfile, then falls back to
+    shutil.copyfileobj.
+    """
+    # Unbuffered, so the lseek calls below are all the state to reset
+    with open(src, 'rb', buffering=0) as fsrc, open(dst, 'wb', buffering=0) as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        
+        for kernel_copy in (_copy_file_range, _sendfile):
+            try:
+                kernel_copy(src_fd, dst_fd, st.st_size)
+                break
+            except OSError:
+                # Start over on a clean destination
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+        else:
+            shutil.copyfileobj(fsrc, fdst)
+    
+    _copy_metadata(dst, st)
+
+def _link_or_copy(src, dst, st, link_mode='reflink'):
+    """
+    Place a copy of src at dst, avoiding byte copies where possible
+    
+    The copy is built under a temporary name next to dst and renamed over
+    it, so a failed copy leaves an existing dst untouched, and a dst that
+    is hardlinked to its source sample is replaced rather than written
+    through.
+    
+    Args:
+        src: Source file path
+        dst: Destination file path (replaced if it exists)
+        st: os.stat_result of src, reused instead of stat-ing it again
+        link_mode: 'reflink', 'hardlink' or 'copy'; reflink and hardlink
+            fall back to _fast_copy when the filesystem refuses them
+            (e.g. across devices)
+    """
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    
+    # Leftover from an interrupted run
+    try:
+        os.unlink(tmp)
+    except FileNotFoundError:
+        pass
+    
+    try:
+        _place(src, tmp, st, link_mode)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def _place(src, dst, st, link_mode):
+    """Create dst from src using link_mode, falling back to _fast_copy"""
+    try:
+        if link_mode == 'hardlink':
+            os.link(src, dst)
+            return
+        if link_mode == 'reflink':
+            _reflink(src, dst)
+            _copy_metadata(dst, st)
+            return
+    except OSError:
+        pass
+    
+    _fast_copy(src, dst, st)
+
+def _drop_page_cache(path, st):
+    """
+    Evict a large sample from the page cache once it has been hashed and
+    copied, so a big corpus doesn't push everything else out
+    """
+    if st.st_size < MMAP_THRESHOLD or not hasattr(os, 'posix_fadvise'):
+        return
+    
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def _iter_exe_files(directory):
+    """Yield regular .exe files in a directory as os.DirEntry objects"""
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith('.exe') and entry.is_file(follow_symlinks=False):
+                yield entry
+
+def _write_json_atomic(path, data, **dump_kwargs):
+    """Write JSON to a temp file and rename it over path"""
+    tmp_file = path.with_suffix('.json.tmp')
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except FileNotFoundError:
+            pass
+        raise
+
+def _new_hasher(algorithm):
+    """Create a hasher for one of HASH_ALGORITHMS"""
+    if algorithm == 'blake3':
+        # Single-threaded: there is already one worker process per CPU
+        return blake3.blake3()
+    return hashlib.sha256()
+
+def _cache_key(st):
+    """Hash cache key: changes whenever the file is replaced or modified"""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+def _stat_id(st):
+    """Build an 8 byte file id from size and mtime"""
+    return struct.pack('>II', st.st_size & 0xffffffff, st.st_mtime_ns & 0xffffffff)
+
+def _process_one(file_path, st=None, need_hash=True, algorithm='sha256'):
+    """
+    Validate and optionally hash a single sample (runs in a worker process)
+    
+    Returns:
+        (file_path, file_hash, ok, err) - err is None for non-PE files,
+        file_hash is None when need_hash is False
+    """
+    try:
+        if not SampleOrganizer.is_pe_file(file_path):
+            return file_path, None, False, None
+        if not need_hash:
+            return file_path, None, True, None
+        return file_path, SampleOrganizer.get_file_hash(file_path, st, algorithm), True, None
+    except Exception as e:
+        return file_path, None, False, str(e)
+
+def _process_batch(jobs):
+    """Run _process_one over a list of (file_path, st, need_hash, algorithm) jobs"""
+    return [_process_one(*job) for job in jobs]
+
 def main():
     import argparse
     
@@ -191,6 +723,9 @@ Examples:
   
   # Organize both
   python3 organize_samples.py --malware ./malware --benign ./benign
+  
+  # Hardlink instead of copying (source and output on the same filesystem)
+  python3 organize_samples.py --malware ./malware --link-mode hardlink
         """
     )
     
@@ -213,23 +748,53 @@ Examples:
         help='Output base directory (default: packhero-dataset)'
     )
     
+    parser.add_argument(
+        '--link-mode',
+        choices=['reflink', 'hardlink', 'copy'],
+        default='reflink',
+        help='How to place samples in the dataset; falls back to a plain '
+             'copy when unsupported (default: reflink)'
+    )
+    
+    parser.add_argument(
+        '--hash-algorithm',
+        choices=HASH_ALGORITHMS,
+        default='sha256',
+        help='Digest used for duplicate detection and as the filename prefix '
+             'of samples whose size matched another sample (others are '
+             'prefixed with a size/mtime id); blake3 needs the blake3 package '
+             '(default: sha256)'
+    )
+    
     args = parser.parse_args()
     
     if not args.malware and not args.benign:
         parser.error("Provide at least --malware or --benign directory")
     
+    if args.hash_algorithm == 'blake3' and blake3 is None:
+        parser.error("--hash-algorithm blake3 requires: pip install blake3")
+    
     # Create organizer
-    organizer = SampleOrganizer(base_dir=args.output)
+    organizer = SampleOrganizer(
+        base_dir=args.output,
+        link_mode=args.link_mode,
+        hash_algorithm=args.hash_algorithm
+    )
     
     # Setup directories
     organizer.setup_directories()
     
     # Organize samples
+    sources = []
     if args.malware:
-        organizer.organize_samples(args.malware, sample_type='malware')
+        sources.append((args.malware, 'malware'))
     
     if args.benign:
-        organizer.organize_samples(args.benign, sample_type='benign')
+        sources.append((args.benign, 'benign'))
+    
+    organizer.organize(sources)
+    
+    organizer.save_hash_cache()
     
     # Generate metadata
     organizer.generate_metadata()